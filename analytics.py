@@ -0,0 +1,162 @@
+import re
+import logging
+from datetime import datetime
+from collections import Counter
+from models import db, TwitchStream, ChatMessage, Chatter, StreamChatSummary, StreamMonthRollup
+from models import FLAG_MODERATOR, FLAG_SUBSCRIBER, FLAG_BROADCASTER
+
+logger = logging.getLogger(__name__)
+
+TOP_CHATTERS_LIMIT = 10
+TOP_PHRASES_LIMIT = 10
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+class ChatSummaryBuilder:
+    """Считает агрегаты чата стрима за один проход по сообщениям"""
+
+    def __init__(self, duration_seconds=0):
+        self.duration_seconds = duration_seconds or 0
+        self.total = 0
+        self.per_minute = Counter()
+        self.chatters = Counter()
+        self.phrases = Counter()
+        self.flag_counts = Counter()
+
+    def add(self, username, text, time_seconds, flags=0):
+        self.total += 1
+        self.per_minute[int(time_seconds // 60)] += 1
+        self.chatters[username] += 1
+
+        phrase = _WHITESPACE_RE.sub(' ', text).strip().lower()
+        if phrase:
+            self.phrases[phrase] += 1
+
+        for flag in (FLAG_MODERATOR, FLAG_SUBSCRIBER, FLAG_BROADCASTER):
+            if flags & flag:
+                self.flag_counts[flag] += 1
+
+    def build(self):
+        """Возвращает поля для StreamChatSummary"""
+        minutes = max(
+            int(self.duration_seconds // 60) + 1,
+            max(self.per_minute) + 1 if self.per_minute else 0,
+        )
+        timeline = [self.per_minute.get(m, 0) for m in range(minutes)]
+        peak_minute = max(range(len(timeline)), key=timeline.__getitem__) if self.total else None
+
+        def share(flag):
+            return round(self.flag_counts[flag] / self.total, 4) if self.total else 0
+
+        return {
+            'total_messages': self.total,
+            'unique_chatters': len(self.chatters),
+            'messages_per_minute': timeline,
+            'avg_messages_per_minute': round(self.total / minutes, 2) if minutes else 0,
+            'peak_minute': peak_minute,
+            'peak_messages_per_minute': timeline[peak_minute] if peak_minute is not None else 0,
+            'mod_share': share(FLAG_MODERATOR),
+            'sub_share': share(FLAG_SUBSCRIBER),
+            'broadcaster_share': share(FLAG_BROADCASTER),
+            'top_chatters': [
+                {'username': name, 'messages': count}
+                for name, count in self.chatters.most_common(TOP_CHATTERS_LIMIT)
+            ],
+            'top_phrases': [
+                {'text': text, 'count': count}
+                for text, count in self.phrases.most_common(TOP_PHRASES_LIMIT)
+                if count > 1
+            ],
+        }
+
+
+def save_summary(stream_id, fields):
+    """Создаёт или обновляет сводку стрима из результата ChatSummaryBuilder.build() (без commit)"""
+    summary = StreamChatSummary.query.filter_by(stream_id=stream_id).first()
+    if not summary:
+        summary = StreamChatSummary(stream_id=stream_id)
+        db.session.add(summary)
+
+    for field, value in fields.items():
+        setattr(summary, field, value)
+    summary.computed_at = datetime.utcnow()
+    return summary
+
+
+def rebuild_summaries(stream_ids=None, batch_size=10000, commit_every=20):
+    """Пересчитывает сводки из сохранённого чата.
+
+    Стримы обрабатываются по одному: сообщения стрима читаются потоково
+    по индексу stream_id, сводка сохраняется сразу, commit — раз в
+    commit_every стримов. В памяти держится только агрегат текущего стрима.
+    Возвращает число пересчитанных стримов.
+    """
+    streams = TwitchStream.query
+    if stream_ids:
+        streams = streams.filter(TwitchStream.id.in_(stream_ids))
+    streams = streams.with_entities(TwitchStream.id, TwitchStream.duration_seconds).order_by(TwitchStream.id).all()
+
+    for done, (stream_id, duration) in enumerate(streams, 1):
+        rows = db.session.query(
+            Chatter.username,
+            ChatMessage.message_text,
+            ChatMessage.message_time_seconds,
+            ChatMessage.flags,
+        ).join(Chatter, ChatMessage.chatter_id == Chatter.id).filter(
+            ChatMessage.stream_id == stream_id
+        ).execution_options(yield_per=batch_size)
+
+        # Стримы без сообщений тоже получают (пустую) сводку
+        builder = ChatSummaryBuilder(duration)
+        for username, text, time_seconds, flags in rows:
+            builder.add(username, text, time_seconds, flags)
+
+        save_summary(stream_id, builder.build())
+        logger.info(f"📊 Сводка чата пересчитана: стрим {stream_id}")
+        if done % commit_every == 0:
+            db.session.commit()
+
+    db.session.commit()
+    return len(streams)
+
+
+# ============ ПОМЕСЯЧНЫЕ СВОДКИ ============
+
+def month_key(stream_date):
+    return stream_date.strftime('%Y-%m')
+
+
+def bump_month_rollup(stream_date, streams=0, with_chat=0, duration_seconds=0):
+    """Добавляет стрим (или чат стрима) в помесячную сводку (без commit)"""
+    month = month_key(stream_date)
+    rollup = db.session.get(StreamMonthRollup, month)
+    if not rollup:
+        rollup = StreamMonthRollup(month=month, stream_count=0, with_chat_count=0, total_duration_seconds=0)
+        db.session.add(rollup)
+    rollup.stream_count += streams
+    rollup.with_chat_count += with_chat
+    rollup.total_duration_seconds += duration_seconds or 0
+    return rollup
+
+
+def rebuild_month_rollups():
+    """Пересчитывает помесячные сводки одним GROUP BY по покрывающему индексу"""
+    month = db.func.strftime('%Y-%m', TwitchStream.stream_date)
+    rows = db.session.query(
+        month,
+        db.func.count(TwitchStream.id),
+        db.func.sum(db.case((TwitchStream.chat_message_count > 0, 1), else_=0)),
+        db.func.coalesce(db.func.sum(TwitchStream.duration_seconds), 0),
+    ).filter(TwitchStream.is_downloaded == True).group_by(month).all()
+
+    StreamMonthRollup.query.delete()
+    for key, streams, with_chat, duration in rows:
+        db.session.add(StreamMonthRollup(
+            month=key,
+            stream_count=streams,
+            with_chat_count=with_chat or 0,
+            total_duration_seconds=int(duration),
+        ))
+    db.session.commit()
+    return len(rows)
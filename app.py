@@ -1,11 +1,17 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from config import (
     DATABASE_URL, SECRET_KEY, DEBUG, TWITCH_CHANNEL, 
-    PROJECT_NAME, PROJECT_DESCRIPTION, BASE_DIR
+    PROJECT_NAME, PROJECT_DESCRIPTION, BASE_DIR, SYNC_PROGRESS_INTERVAL, SUGGEST_LIMIT_MAX,
+    SYNC_STATUS_STREAM_SECONDS, SYNC_STATUS_RETRY_MS
 )
-from models import db, TwitchStream, ChatMessage, ArchiveStats
+from models import db, TwitchStream, ChatMessage, Chatter, StreamChatSummary, StreamMonthRollup, ArchiveStats
+from schema import upgrade_schema
+from suggest import SuggestIndex
+from progress import ProgressStore
+import json
+import time
 import logging
 from datetime import datetime
 from sqlalchemy import desc
@@ -25,9 +31,11 @@ app.config['DEBUG'] = DEBUG
 db.init_app(app)
 CORS(app)
 
-# Создаём таблицы
+# Создаём таблицы; индекс подсказок строится при первом запросе
+suggest_index = SuggestIndex()
 with app.app_context():
     db.create_all()
+    upgrade_schema()
     logger.info("✅ БД инициализирована")
 
 # ============ ROUTES ============
@@ -65,16 +73,100 @@ def index():
 def stream_view(stream_id):
     """Просмотр стрима с чатом"""
     stream = TwitchStream.query.get_or_404(stream_id)
+    
+    # Учёт обращений для политики хранения: инкремент на стороне БД,
+    # чтобы параллельные воркеры не затирали друг друга; updated_at не трогаем
+    db.session.execute(
+        db.update(TwitchStream)
+        .where(TwitchStream.id == stream_id)
+        .values(
+            views=db.func.coalesce(TwitchStream.views, 0) + 1,
+            last_accessed_at=datetime.utcnow(),
+            updated_at=TwitchStream.updated_at,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    
     return render_template('stream.html', stream=stream)
 
+def _parse_date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Неверная дата в параметре {name}: {value} (ожидается YYYY-MM-DD)")
+
+def _parse_month_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m')
+    except ValueError:
+        raise ValueError(f"Неверный месяц в параметре {name}: {value} (ожидается YYYY-MM)")
+
+def _month_facets(query, rollup_only):
+    """Количество стримов по месяцам: из готовой сводки или GROUP BY по покрывающему индексу"""
+    if rollup_only:
+        rollups = StreamMonthRollup.query.order_by(desc(StreamMonthRollup.month)).all()
+        return [r.to_dict() for r in rollups if r.stream_count]
+    
+    month = db.func.strftime('%Y-%m', TwitchStream.stream_date)
+    rows = query.with_entities(
+        month,
+        db.func.count(TwitchStream.id),
+        db.func.sum(db.case((TwitchStream.chat_message_count > 0, 1), else_=0)),
+        db.func.coalesce(db.func.sum(TwitchStream.duration_seconds), 0),
+    ).order_by(None).group_by(month).order_by(desc(month)).all()
+    return [
+        {'month': m, 'streams': n, 'with_chat': c or 0, 'duration_hours': round(d / 3600, 1)}
+        for m, n, c, d in rows
+    ]
+
 @app.route('/api/streams')
 def api_streams():
-    """API для получения списка стримов (JSON)"""
+    """API для получения списка стримов (JSON).
+    
+    Фильтры: date_from, date_to (YYYY-MM-DD, конец не включается), month (YYYY-MM),
+    min_duration, max_duration (секунды), has_chat (true/false).
+    С facets=1 в ответ добавляется количество стримов по месяцам.
+    """
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
     
-    streams = TwitchStream.query\
-        .filter_by(is_downloaded=True)\
+    try:
+        date_from = _parse_date_arg('date_from')
+        date_to = _parse_date_arg('date_to')
+        month = _parse_month_arg('month')
+        if month:
+            date_from = month
+            date_to = datetime(date_from.year + date_from.month // 12, date_from.month % 12 + 1, 1)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    min_duration = request.args.get('min_duration', type=int)
+    max_duration = request.args.get('max_duration', type=int)
+    has_chat = request.args.get('has_chat')
+    
+    query = TwitchStream.query.filter(TwitchStream.is_downloaded == True)
+    if date_from:
+        query = query.filter(TwitchStream.stream_date >= date_from)
+    if date_to:
+        query = query.filter(TwitchStream.stream_date < date_to)
+    if min_duration is not None:
+        query = query.filter(TwitchStream.duration_seconds >= min_duration)
+    if max_duration is not None:
+        query = query.filter(TwitchStream.duration_seconds <= max_duration)
+    if has_chat is not None:
+        if has_chat.lower() in ('1', 'true', 'yes'):
+            query = query.filter(TwitchStream.chat_message_count > 0)
+        else:
+            query = query.filter(db.func.coalesce(TwitchStream.chat_message_count, 0) == 0)
+    
+    streams = query\
         .order_by(desc(TwitchStream.stream_date))\
         .paginate(page=page, per_page=per_page)
     
@@ -82,10 +174,27 @@ def api_streams():
         'streams': [s.to_dict() for s in streams.items],
         'total_pages': streams.pages,
         'current_page': page,
-        'total_streams': TwitchStream.query.filter_by(is_downloaded=True).count(),
+        'total_streams': streams.total,
         'total_messages': db.session.query(ChatMessage).count(),
     }
     
+    if request.args.get('facets', type=int):
+        # Фильтры по целым месяцам отвечаются готовой помесячной сводкой,
+        # остальные — GROUP BY по покрывающему индексу
+        def month_aligned(d):
+            return d is None or (d.day == 1 and d.time() == datetime.min.time())
+        
+        rollup_only = min_duration is None and max_duration is None and has_chat is None \
+            and month_aligned(date_from) and month_aligned(date_to)
+        facets = _month_facets(query, rollup_only)
+        if rollup_only:
+            facets = [
+                f for f in facets
+                if (not date_from or f['month'] >= date_from.strftime('%Y-%m'))
+                and (not date_to or f['month'] < date_to.strftime('%Y-%m'))
+            ]
+        data['facets'] = {'months': facets}
+    
     return jsonify(data)
 
 @app.route('/api/stream/<int:stream_id>')
@@ -103,6 +212,7 @@ def api_stream_detail(stream_id):
         'messages_count': stream.chat_message_count,
         'video_path': stream.local_video_path,
         'thumbnail': stream.thumbnail_url,
+        'storage_tier': stream.storage_tier,
     }
     
     return jsonify(data)
@@ -113,6 +223,7 @@ def api_stream_chat(stream_id):
     stream = TwitchStream.query.get_or_404(stream_id)
     
     messages = ChatMessage.query\
+        .options(db.joinedload(ChatMessage.chatter))\
         .filter_by(stream_id=stream_id)\
         .order_by(ChatMessage.message_time_seconds.asc())\
         .all()
@@ -126,6 +237,101 @@ def api_stream_chat(stream_id):
     
     return jsonify(data)
 
+@app.route('/api/stream/<int:stream_id>/summary')
+def api_stream_summary(stream_id):
+    """API для получения предпосчитанной аналитики чата стрима"""
+    summary = StreamChatSummary.query.filter_by(stream_id=stream_id).first_or_404()
+    return jsonify(summary.to_dict())
+
+@app.route('/api/chatters/top')
+def api_top_chatters():
+    """API для получения самых активных авторов чата"""
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    
+    chatters = Chatter.query\
+        .order_by(desc(Chatter.message_count))\
+        .limit(limit)\
+        .all()
+    
+    return jsonify({'chatters': [c.to_dict() for c in chatters]})
+
+@app.route('/api/chatter/<username>/messages')
+def api_chatter_messages(username):
+    """API для получения сообщений автора по всем стримам"""
+    chatter = Chatter.query.filter_by(username=username).first_or_404()
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 50, type=int)
+    
+    messages = chatter.messages\
+        .order_by(ChatMessage.stream_id.desc(), ChatMessage.message_time_seconds.asc())\
+        .paginate(page=page, per_page=per_page)
+    
+    data = {
+        'chatter': chatter.to_dict(),
+        'messages': [dict(m.to_dict(), stream_id=m.stream_id) for m in messages.items],
+        'total_pages': messages.pages,
+        'current_page': page,
+    }
+    
+    return jsonify(data)
+
+@app.route('/api/suggest')
+def api_suggest():
+    """API подсказок для поиска по мере ввода"""
+    query = request.args.get('q', '')
+    limit = min(request.args.get('limit', 8, type=int), SUGGEST_LIMIT_MAX)
+    
+    suggest_index.ensure_started(app)
+    data = suggest_index.suggest(query, limit=limit)
+    data['query'] = query
+    
+    return jsonify(data)
+
+def _sync_status():
+    status = ProgressStore().read()
+    for entry in status.get('downloads', {}).values():
+        total = entry.get('total_bytes')
+        downloaded = entry.get('downloaded_bytes')
+        entry['percent'] = round((downloaded or 0) * 100 / total, 1) if total else None
+    return status
+
+@app.route('/api/sync/status')
+def api_sync_status():
+    """API состояния синхронизации: прогресс, скорость и ETA по каждому VOD.
+    
+    С ?stream=1 (или Accept: text/event-stream) отдаёт server-sent events:
+    новое событие при каждом обновлении снимка. Соединение живёт
+    SYNC_STATUS_STREAM_SECONDS, чтобы не занимать поток воркера,
+    после чего браузер сам переподключается (через retry мс).
+    """
+    wants_stream = request.args.get('stream', type=int) or \
+        request.accept_mimetypes.best == 'text/event-stream'
+    if not wants_stream:
+        return jsonify(_sync_status())
+    
+    store = ProgressStore()
+    
+    def events():
+        last_mtime = None
+        last_sent = 0
+        deadline = time.monotonic() + SYNC_STATUS_STREAM_SECONDS
+        yield f"retry: {SYNC_STATUS_RETRY_MS}\n\n"
+        while time.monotonic() < deadline:
+            mtime = store.mtime()
+            if mtime != last_mtime:
+                last_mtime = mtime
+                last_sent = time.monotonic()
+                yield f"data: {json.dumps(_sync_status(), ensure_ascii=False)}\n\n"
+            elif time.monotonic() - last_sent > 15:
+                last_sent = time.monotonic()
+                yield ": keep-alive\n\n"
+            time.sleep(SYNC_PROGRESS_INTERVAL)
+    
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
 @app.route('/search')
 def search():
     """Поиск по стримам"""
@@ -0,0 +1,201 @@
+import os
+import json
+import logging
+from datetime import datetime
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from models import (
+    db, TwitchStream, Chatter, ChatMessage, StreamChatSummary, StreamMonthRollup, ArchiveStats
+)
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('ndjson', 'parquet')
+MANIFEST_NAME = 'manifest.json'
+
+# Порядок важен: импорт идёт по нему, чтобы внешние ключи уже существовали
+TABLES = [
+    TwitchStream.__table__,
+    Chatter.__table__,
+    ChatMessage.__table__,
+    StreamChatSummary.__table__,
+    StreamMonthRollup.__table__,
+    ArchiveStats.__table__,
+]
+
+
+def _column_kinds(table):
+    """Имена колонок с датами и JSON — их нужно (де)сериализовать вручную"""
+    datetime_cols = [c.name for c in table.columns if isinstance(c.type, db.DateTime)]
+    json_cols = [c.name for c in table.columns if isinstance(c.type, db.JSON)]
+    return datetime_cols, json_cols
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise RuntimeError("Для формата parquet нужен пакет pyarrow: pip install pyarrow")
+
+
+# ============ ЭКСПОРТ ============
+
+def _write_part(path, fmt, rows, datetime_cols, json_cols):
+    if fmt == 'ndjson':
+        with open(path, 'w', encoding='utf-8') as f:
+            for row in rows:
+                for col in datetime_cols:
+                    if row[col] is not None:
+                        row[col] = row[col].isoformat()
+                f.write(json.dumps(row, ensure_ascii=False))
+                f.write('\n')
+    else:
+        import pyarrow
+        import pyarrow.parquet as pq
+        for row in rows:
+            for col in json_cols:
+                if row[col] is not None:
+                    row[col] = json.dumps(row[col], ensure_ascii=False)
+        pq.write_table(pyarrow.Table.from_pylist(rows), path, compression='zstd')
+
+
+def export_archive(out_dir, fmt='ndjson', chunk_rows=100000):
+    """Выгружает архив в папку: по несколько файлов-частей на таблицу + manifest.json.
+
+    Таблицы читаются курсором порциями по chunk_rows строк, так что
+    память не зависит от размера архива. Все таблицы читаются в одной
+    транзакции — из одного снимка БД (на время экспорта архиватор
+    не сможет закоммитить запись).
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат: {fmt}")
+    if fmt == 'parquet':
+        _require_pyarrow()
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {
+        'format': fmt,
+        'created_at': datetime.utcnow().isoformat(),
+        'tables': {},
+    }
+
+    with db.engine.connect() as connection:
+        # pysqlite не шлёт BEGIN перед SELECT: без явной транзакции каждая
+        # таблица читалась бы из своего снимка, и в выгрузку мог попасть
+        # чат стрима, закоммиченного уже после чтения streams
+        connection.exec_driver_sql('BEGIN')
+        connection = connection.execution_options(stream_results=True)
+
+        for table in TABLES:
+            datetime_cols, json_cols = _column_kinds(table)
+            result = connection.execute(db.select(table).order_by(*table.primary_key.columns))
+
+            parts, total = [], 0
+            for chunk in result.mappings().partitions(chunk_rows):
+                part_name = f"{table.name}-{len(parts):05d}.{fmt}"
+                _write_part(os.path.join(out_dir, part_name), fmt, [dict(r) for r in chunk], datetime_cols, json_cols)
+                parts.append(part_name)
+                total += len(chunk)
+
+            manifest['tables'][table.name] = {'rows': total, 'parts': parts}
+            logger.info(f"📤 {table.name}: {total} строк, {len(parts)} файлов")
+
+    with open(os.path.join(out_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    return manifest
+
+
+# ============ ИМПОРТ ============
+
+def _parse_part(path, fmt, datetime_cols, json_cols):
+    """Читает файл-часть в список словарей (выполняется в процессе пула)"""
+    if fmt == 'ndjson':
+        with open(path, encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        for row in rows:
+            for col in datetime_cols:
+                if row.get(col):
+                    row[col] = datetime.fromisoformat(row[col])
+    else:
+        import pyarrow.parquet as pq
+        rows = pq.read_table(path).to_pylist()
+        for row in rows:
+            for col in json_cols:
+                if row.get(col) is not None:
+                    row[col] = json.loads(row[col])
+    return rows
+
+
+def _bounded_map(pool, fn, args_list, max_in_flight):
+    """Как pool.map, но держит в работе не больше max_in_flight задач"""
+    pending = deque()
+    for args in args_list:
+        pending.append(pool.submit(fn, *args))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+    for future in pending:
+        yield future.result()
+
+
+def import_archive(in_dir, workers=None, replace=False):
+    """Загружает архив, выгруженный export_archive.
+
+    Файлы-части разбираются в пуле процессов, строки вставляются
+    пачками через executemany. Целевые таблицы должны быть пустыми,
+    либо replace=True — тогда БД пересоздаётся. В выгрузках старых версий
+    нет помесячных сводок — они пересчитываются по импортированным стримам.
+    """
+    with open(os.path.join(in_dir, MANIFEST_NAME), encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    fmt = manifest['format']
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат: {fmt}")
+    if fmt == 'parquet':
+        _require_pyarrow()
+
+    if replace:
+        db.drop_all()
+        db.create_all()
+    else:
+        for table in TABLES:
+            if db.session.execute(db.select(db.func.count()).select_from(table)).scalar():
+                raise ValueError(f"Таблица {table.name} не пуста (используйте replace)")
+
+    workers = workers or os.cpu_count() or 1
+    imported = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for table in TABLES:
+            info = manifest['tables'].get(table.name)
+            if not info:
+                continue
+
+            datetime_cols, json_cols = _column_kinds(table)
+            columns = {c.name for c in table.columns}
+            jobs = [
+                (os.path.join(in_dir, part), fmt, datetime_cols, json_cols)
+                for part in info['parts']
+            ]
+
+            total = 0
+            for rows in _bounded_map(pool, _parse_part, jobs, max_in_flight=workers * 2):
+                if not rows:
+                    continue
+                # Колонки, которых нет в текущей схеме, отбрасываем
+                rows = [{k: v for k, v in row.items() if k in columns} for row in rows]
+                db.session.execute(table.insert(), rows)
+                db.session.commit()
+                total += len(rows)
+
+            imported[table.name] = total
+            logger.info(f"📥 {table.name}: {total} строк")
+
+    if StreamMonthRollup.__tablename__ not in manifest['tables']:
+        from analytics import rebuild_month_rollups
+        months = rebuild_month_rollups()
+        logger.info(f"📊 Помесячные сводки пересчитаны: {months}")
+
+    return imported
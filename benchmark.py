@@ -0,0 +1,96 @@
+import os
+import sys
+import time
+import logging
+import threading
+import subprocess
+from itertools import cycle
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+logger = logging.getLogger(__name__)
+
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def default_paths(base_url):
+    """Список стримов и чат самого свежего стрима — самый тяжёлый ответ"""
+    paths = ['/api/streams']
+    try:
+        streams = requests.get(f"{base_url}/api/streams?per_page=1", timeout=10).json()['streams']
+        if streams:
+            paths.append(f"/api/stream/{streams[0]['id']}/chat")
+    except (requests.RequestException, KeyError, ValueError):
+        pass
+    return paths
+
+
+def run_load(base_url, paths, total_requests=500, concurrency=16):
+    """Гоняет запросы по кругу по paths и возвращает сводку по задержкам"""
+    local = threading.local()
+
+    def fetch(path):
+        # keep-alive соединение на поток, как у реального браузера
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        session = local.session
+        start = time.perf_counter()
+        try:
+            response = session.get(base_url + path, timeout=60)
+            ok = response.status_code == 200
+            size = len(response.content)
+        except requests.RequestException:
+            ok, size = False, 0
+        return time.perf_counter() - start, ok, size
+
+    targets = cycle(paths)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(fetch, (next(targets) for _ in range(total_requests))))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(r[0] for r in results)
+    return {
+        'requests': total_requests,
+        'concurrency': concurrency,
+        'errors': sum(1 for r in results if not r[1]),
+        'elapsed_s': round(elapsed, 2),
+        'rps': round(total_requests / elapsed, 1) if elapsed else 0,
+        'mb_per_s': round(sum(r[2] for r in results) / elapsed / 1024 ** 2, 2) if elapsed else 0,
+        'p50_ms': round(_percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(_percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(_percentile(latencies, 99) * 1000, 1),
+    }
+
+
+def spawn_server(mode, port, workers=None, threads=None):
+    """Запускает `run.py run` (dev) или `run.py serve` (prod) и ждёт готовности"""
+    command = [sys.executable, os.path.join(PROJECT_DIR, 'run.py'), 'run' if mode == 'dev' else 'serve', '--port', str(port)]
+    if mode == 'prod':
+        if workers:
+            command += ['--workers', str(workers)]
+        if threads:
+            command += ['--threads', str(threads)]
+
+    process = subprocess.Popen(command, cwd=PROJECT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Сервер ({mode}) завершился при запуске")
+        try:
+            requests.get(f"{base_url}/api/streams?per_page=1", timeout=1)
+            return process, base_url
+        except requests.RequestException:
+            time.sleep(0.3)
+
+    process.terminate()
+    raise RuntimeError(f"Сервер ({mode}) не ответил за 30 секунд")
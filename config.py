@@ -25,12 +25,46 @@ DATABASE_URL = f"sqlite:///{DB_PATH}"
 SECRET_KEY = "your-secret-key-goodoq-archive-2025"
 DEBUG = False
 
+# ============ PRODUCTION-СЕРВЕР (run.py serve) ============
+SERVER_WORKERS = None  # Процессов-воркеров (None - 2 * CPU + 1)
+SERVER_THREADS = 4  # Потоков в каждом воркере
+SERVER_KEEPALIVE = 5  # Сколько держать keep-alive соединение (сек)
+SERVER_TIMEOUT = 120  # Воркер, молчащий дольше, перезапускается (сек)
+SERVER_GRACEFUL_TIMEOUT = 30  # Время на завершение запросов при перезагрузке (сек)
+SERVER_MAX_REQUESTS = 1000  # Перезапуск воркера после N запросов (0 - никогда)
+
+# ============ ПОДСКАЗКИ ПОИСКА ============
+SUGGEST_REFRESH_SECONDS = 30  # Как часто дочитывать новые стримы в индекс
+SUGGEST_MIN_CHATTER_MESSAGES = 5  # Автор попадает в подсказки с этого числа сообщений
+SUGGEST_MAX_CHATTERS = 20000  # Максимум авторов в индексе
+SUGGEST_LIMIT_MAX = 20  # Максимум подсказок каждого вида в ответе
+
 # ============ ПАРАМЕТРЫ СКАЧИВАНИЯ ============
 MAX_VIDEOS_PER_SYNC = 10  # Максимум видео за один запуск
 VIDEO_QUALITY = "best[ext=mp4]"  # Качество видео
 GENERATE_SYNTHETIC_CHAT = True  # Генерировать синтетический чат если не найден исходный
 CHAT_MESSAGES_PER_VIDEO = 100  # Примерно сообщений чата на одно видео
 
+# ============ ЦЕЛОСТНОСТЬ ВИДЕО ============
+HASH_ALGORITHM = "sha256"  # Алгоритм контрольной суммы видео
+HASH_CHUNK_SIZE = 8 * 1024 * 1024  # Размер блока чтения при хешировании (байт)
+VERIFY_WORKERS = 4  # Потоков для проверки архива
+VERIFY_MAX_MBPS = 200  # Ограничение скорости чтения при проверке (МБ/с, 0 - без ограничения)
+
+# ============ ХРАНЕНИЕ ВИДЕО ============
+COLD_STORAGE_DIR = os.path.join(BASE_DIR, "cold_storage")  # Куда переносятся вытесненные видео
+VIDEO_QUOTA_GB = 0  # Лимит на папку VIDEO_DIR (0 - без ограничения)
+MIN_FREE_SPACE_GB = 5  # Минимум свободного места на диске с VIDEO_DIR
+RETENTION_POLICY = "lru"  # "lru" - давно не открывали, "least_viewed" - меньше всего просмотров
+COLD_STORAGE_RECOMPRESS = False  # Пережимать видео при переносе в холодное хранилище (нужен ffmpeg)
+COLD_STORAGE_CRF = 28  # Качество пережатия (больше - меньше файл)
+RETENTION_GRACE_HOURS = 24  # Не вытеснять VOD, скачанные, восстановленные или открытые за последние N часов
+RETENTION_ESTIMATE_MBPS = 8  # Битрейт для оценки размера нового VOD, если yt-dlp не знает размер
+
+# ============ ЭКСПОРТ / ИМПОРТ ============
+EXPORT_CHUNK_ROWS = 100000  # Строк в одном файле-части
+IMPORT_WORKERS = os.cpu_count() or 1  # Процессов для разбора файлов при импорте
+
 # ============ РАСПИСАНИЕ АВТОМАТИЗАЦИИ ============
 AUTO_SYNC_INTERVAL_HOURS = 24  # Синхронизация каждые 24 часа
 AUTO_SYNC_ENABLED = True  # Включить автоматическую синхронизацию
@@ -38,6 +72,12 @@ AUTO_SYNC_ENABLED = True  # Включить автоматическую син
 # ============ ЛОГИРОВАНИЕ ============
 LOG_FILE = os.path.join(LOG_DIR, f"{TWITCH_CHANNEL}_sync.log")
 
+# ============ ПРОГРЕСС СИНХРОНИЗАЦИИ ============
+SYNC_PROGRESS_FILE = os.path.join(LOG_DIR, f"{TWITCH_CHANNEL}_sync_progress.json")  # Общий для архиватора и веб-сервера
+SYNC_PROGRESS_INTERVAL = 1.0  # Не чаще одного снимка прогресса в N секунд на VOD
+SYNC_STATUS_STREAM_SECONDS = 60  # Сколько живёт одно SSE-соединение (потом клиент переподключается)
+SYNC_STATUS_RETRY_MS = 3000  # Пауза перед переподключением SSE-клиента
+
 # ============ API ПАРАМЕТРЫ (ПУБЛИЧНЫЕ, БЕЗ АВТОРИЗАЦИИ) ============
 TWITCH_HELIX_API = "https://api.twitch.tv/helix"
 TWITCH_GRAPHQL_API = "https://gql.twitch.tv/gql"
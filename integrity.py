@@ -0,0 +1,178 @@
+import os
+import mmap
+import glob
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from config import HASH_ALGORITHM, HASH_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+CHECKSUM_SUFFIX = f".{HASH_ALGORITHM}"
+
+
+class StreamHasher:
+    """Инкрементальный хеш файла, который дописывается во время скачивания.
+
+    yt-dlp не отдаёт байты в progress hook, поэтому на каждом вызове
+    дочитываем только новый хвост файла (он ещё в page cache) —
+    многогигабайтное видео целиком повторно не читается.
+    """
+
+    def __init__(self, algorithm=HASH_ALGORITHM):
+        self.algorithm = algorithm
+        self._hash = hashlib.new(algorithm)
+        self.offset = 0
+        self.inode = None
+
+    def update_from(self, path, min_bytes=0):
+        """Дочитывает в хеш новые байты файла начиная с текущего смещения.
+
+        min_bytes — не читать, пока не накопилось хотя бы столько новых байт.
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+
+        # Файл начали писать заново (ретрай) — начинаем хеш сначала
+        if st.st_size < self.offset or (self.inode is not None and st.st_ino != self.inode):
+            self._hash = hashlib.new(self.algorithm)
+            self.offset = 0
+        self.inode = st.st_ino
+
+        new_bytes = st.st_size - self.offset
+        if new_bytes == 0 or new_bytes < min_bytes:
+            return
+
+        with open(path, 'rb') as f:
+            f.seek(self.offset)
+            while True:
+                chunk = f.read(HASH_CHUNK_SIZE)
+                if not chunk:
+                    break
+                self._hash.update(chunk)
+                self.offset += len(chunk)
+
+    def finalize(self, path):
+        """Возвращает хеш итогового файла.
+
+        Если после скачивания файл был переписан постпроцессором
+        (другой inode или размер), хеш считается заново целиком.
+        Если хешер не видел скачивания (offset 0), файл читается один раз.
+        """
+        st = os.stat(path)
+        if (self.inode is not None and st.st_ino != self.inode) or st.st_size < self.offset:
+            logger.info(f"♻️  Файл изменён после скачивания, пересчитываю хеш: {path}")
+            return file_hash(path, algorithm=self.algorithm)
+        self.update_from(path)
+        return self._hash.hexdigest()
+
+
+class Throttle:
+    """Общий для всех потоков ограничитель скорости чтения (байт/с)"""
+
+    def __init__(self, bytes_per_second):
+        self.rate = bytes_per_second
+        self._lock = threading.Lock()
+        self._next_time = time.monotonic()
+
+    def consume(self, nbytes):
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_time)
+            self._next_time = start + nbytes / self.rate
+            delay = start - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+def file_hash(path, algorithm=HASH_ALGORITHM, throttle=None):
+    """Считает хеш файла через mmap кусками по HASH_CHUNK_SIZE"""
+    h = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return h.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                for pos in range(0, size, HASH_CHUNK_SIZE):
+                    with view[pos:pos + HASH_CHUNK_SIZE] as chunk:
+                        if throttle:
+                            throttle.consume(len(chunk))
+                        h.update(chunk)
+            finally:
+                view.release()
+    return h.hexdigest()
+
+
+# ============ ФАЙЛЫ С КОНТРОЛЬНЫМИ СУММАМИ ============
+
+def write_checksum(path, digest):
+    """Пишет рядом с видео файл контрольной суммы в формате sha256sum"""
+    with open(path + CHECKSUM_SUFFIX, 'w', encoding='utf-8') as f:
+        f.write(f"{digest}  {os.path.basename(path)}\n")
+
+
+def read_checksum(path):
+    """Читает контрольную сумму видео из соседнего файла (или None)"""
+    try:
+        with open(path + CHECKSUM_SUFFIX, encoding='utf-8') as f:
+            return f.read().split()[0]
+    except (OSError, IndexError):
+        return None
+
+
+def find_verified_copy(video_dir, vod_id):
+    """Ищет уже скачанный файл этого VOD под другим именем.
+
+    Файл подходит, только если его содержимое совпадает с сохранённой
+    контрольной суммой — обрезанные и битые копии игнорируются.
+    """
+    pattern = os.path.join(glob.escape(video_dir), f"*_{glob.escape(str(vod_id))}.*")
+    for candidate in sorted(glob.glob(pattern)):
+        if candidate.endswith(CHECKSUM_SUFFIX) or candidate.endswith('.part'):
+            continue
+        expected = read_checksum(candidate)
+        if not expected:
+            continue
+        if file_hash(candidate) == expected:
+            return candidate, expected
+        logger.warning(f"⚠️  Копия повреждена, игнорирую: {candidate}")
+    return None, None
+
+
+# ============ ПАРАЛЛЕЛЬНАЯ ПРОВЕРКА ============
+
+def verify_files(items, workers=4, max_bytes_per_second=None):
+    """Параллельно перехеширует файлы и сверяет с ожидаемыми хешами.
+
+    items — список кортежей (key, path, expected_hash).
+    Возвращает список словарей с полями key, path, status, digest.
+    status: 'ok', 'mismatch', 'missing', 'new' (ожидаемого хеша не было).
+    """
+    throttle = Throttle(max_bytes_per_second)
+
+    def check(key, path, expected):
+        if not path or not os.path.exists(path):
+            return {'key': key, 'path': path, 'status': 'missing', 'digest': None}
+        digest = file_hash(path, throttle=throttle)
+        if not expected:
+            status = 'new'
+        elif digest == expected:
+            status = 'ok'
+        else:
+            status = 'mismatch'
+        return {'key': key, 'path': path, 'status': status, 'digest': digest}
+
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(check, *item) for item in items]
+        for future in as_completed(futures):
+            results.append(future.result())
+    return results
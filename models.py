@@ -7,6 +7,11 @@ db = SQLAlchemy()
 class TwitchStream(db.Model):
     """Модель стрима"""
     __tablename__ = 'streams'
+    __table_args__ = (
+        # Покрывающие индексы для фильтров /api/streams: по дате и по длительности
+        db.Index('ix_streams_browse_date', 'is_downloaded', 'stream_date', 'duration_seconds', 'chat_message_count'),
+        db.Index('ix_streams_browse_duration', 'is_downloaded', 'duration_seconds', 'stream_date', 'chat_message_count'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     twitch_video_id = db.Column(db.String(255), unique=True, nullable=False, index=True)
@@ -22,6 +27,15 @@ class TwitchStream(db.Model):
     local_video_path = db.Column(db.String(1000))
     thumbnail_url = db.Column(db.String(1000))
     
+    # Целостность файла
+    content_hash = db.Column(db.String(64), index=True)  # Контрольная сумма видео
+    file_size_bytes = db.Column(db.BigInteger)
+    verified_at = db.Column(db.DateTime)  # Последняя успешная проверка
+    
+    # Хранение
+    storage_tier = db.Column(db.String(10), default='hot', index=True)  # 'hot' или 'cold'
+    last_accessed_at = db.Column(db.DateTime)  # Последнее открытие страницы стрима
+    
     # Статусы
     is_downloaded = db.Column(db.Boolean, default=False, index=True)
     is_processed = db.Column(db.Boolean, default=False)
@@ -40,6 +54,7 @@ class TwitchStream(db.Model):
     
     # Связи
     chat_messages = db.relationship('ChatMessage', backref='stream', lazy=True, cascade='all, delete-orphan')
+    chat_summary = db.relationship('StreamChatSummary', backref='stream', uselist=False, cascade='all, delete-orphan')
     
     def __repr__(self):
         return f'<TwitchStream {self.title[:30]}...>'
@@ -56,14 +71,49 @@ class TwitchStream(db.Model):
         }
 
 
+# Флаги автора сообщения (битовая маска ChatMessage.flags)
+FLAG_MODERATOR = 1
+FLAG_SUBSCRIBER = 2
+FLAG_BROADCASTER = 4
+
+
+class Chatter(db.Model):
+    """Модель автора сообщений чата"""
+    __tablename__ = 'chatters'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(200), unique=True, nullable=False)
+    message_count = db.Column(db.Integer, default=0, nullable=False, index=True)
+    
+    # Служебное
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Связи
+    messages = db.relationship('ChatMessage', backref='chatter', lazy='dynamic')
+    
+    def __repr__(self):
+        return f'<Chatter {self.username}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'username': self.username,
+            'messages': self.message_count,
+        }
+
+
 class ChatMessage(db.Model):
     """Модель сообщения чата"""
     __tablename__ = 'chat_messages'
+    __table_args__ = (
+        # Все сообщения автора, сгруппированные по стримам
+        db.Index('ix_chat_messages_chatter_stream', 'chatter_id', 'stream_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     stream_id = db.Column(db.Integer, db.ForeignKey('streams.id'), nullable=False, index=True)
+    chatter_id = db.Column(db.Integer, db.ForeignKey('chatters.id'), nullable=False)
     
-    username = db.Column(db.String(200), nullable=False)
     message_text = db.Column(db.Text, nullable=False)
     
     # Время в видео (в секундах от начала)
@@ -73,14 +123,36 @@ class ChatMessage(db.Model):
     # Реальное время сообщения
     message_timestamp = db.Column(db.DateTime)
     
-    # Флаги пользователя
-    is_moderator = db.Column(db.Boolean, default=False)
-    is_subscriber = db.Column(db.Boolean, default=False)
-    is_broadcaster = db.Column(db.Boolean, default=False)
+    # Флаги пользователя (FLAG_MODERATOR | FLAG_SUBSCRIBER | FLAG_BROADCASTER)
+    flags = db.Column(db.SmallInteger, default=0, nullable=False)
     
     # Служебное
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
+    @staticmethod
+    def pack_flags(is_mod=False, is_sub=False, is_broadcaster=False):
+        return (
+            (FLAG_MODERATOR if is_mod else 0)
+            | (FLAG_SUBSCRIBER if is_sub else 0)
+            | (FLAG_BROADCASTER if is_broadcaster else 0)
+        )
+    
+    @property
+    def username(self):
+        return self.chatter.username
+    
+    @property
+    def is_moderator(self):
+        return bool(self.flags & FLAG_MODERATOR)
+    
+    @property
+    def is_subscriber(self):
+        return bool(self.flags & FLAG_SUBSCRIBER)
+    
+    @property
+    def is_broadcaster(self):
+        return bool(self.flags & FLAG_BROADCASTER)
+    
     def __repr__(self):
         return f'<ChatMessage {self.username}: {self.message_text[:20]}>'
     
@@ -96,6 +168,75 @@ class ChatMessage(db.Model):
         }
 
 
+class StreamChatSummary(db.Model):
+    """Предпосчитанная аналитика чата стрима"""
+    __tablename__ = 'stream_chat_summaries'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    stream_id = db.Column(db.Integer, db.ForeignKey('streams.id'), unique=True, nullable=False)
+    
+    total_messages = db.Column(db.Integer, default=0)
+    unique_chatters = db.Column(db.Integer, default=0)
+    
+    # Активность
+    messages_per_minute = db.Column(db.JSON)  # Список: сообщений в каждую минуту видео
+    avg_messages_per_minute = db.Column(db.Float, default=0)
+    peak_minute = db.Column(db.Integer)
+    peak_messages_per_minute = db.Column(db.Integer, default=0)
+    
+    # Доли сообщений (0..1)
+    mod_share = db.Column(db.Float, default=0)
+    sub_share = db.Column(db.Float, default=0)
+    broadcaster_share = db.Column(db.Float, default=0)
+    
+    top_chatters = db.Column(db.JSON)  # [{'username', 'messages'}]
+    top_phrases = db.Column(db.JSON)  # [{'text', 'count'}]
+    
+    # Служебное
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<StreamChatSummary {self.stream_id}>'
+    
+    def to_dict(self):
+        return {
+            'stream_id': self.stream_id,
+            'total_messages': self.total_messages,
+            'unique_chatters': self.unique_chatters,
+            'messages_per_minute': self.messages_per_minute or [],
+            'avg_messages_per_minute': self.avg_messages_per_minute,
+            'peak_minute': self.peak_minute,
+            'peak_messages_per_minute': self.peak_messages_per_minute,
+            'mod_share': self.mod_share,
+            'sub_share': self.sub_share,
+            'broadcaster_share': self.broadcaster_share,
+            'top_chatters': self.top_chatters or [],
+            'top_phrases': self.top_phrases or [],
+            'computed_at': self.computed_at.isoformat() if self.computed_at else None,
+        }
+
+
+class StreamMonthRollup(db.Model):
+    """Количество скачанных стримов по месяцам (для календарной навигации)"""
+    __tablename__ = 'stream_month_rollups'
+    
+    month = db.Column(db.String(7), primary_key=True)  # 'YYYY-MM'
+    stream_count = db.Column(db.Integer, default=0, nullable=False)
+    with_chat_count = db.Column(db.Integer, default=0, nullable=False)
+    total_duration_seconds = db.Column(db.Integer, default=0, nullable=False)
+    
+    def __repr__(self):
+        return f'<StreamMonthRollup {self.month}: {self.stream_count}>'
+    
+    def to_dict(self):
+        return {
+            'month': self.month,
+            'streams': self.stream_count,
+            'with_chat': self.with_chat_count,
+            'duration_hours': round(self.total_duration_seconds / 3600, 1),
+        }
+
+
 class ArchiveStats(db.Model):
     """Статистика архива"""
     __tablename__ = 'stats'
@@ -0,0 +1,115 @@
+import os
+import json
+import time
+import threading
+from datetime import datetime
+from config import SYNC_PROGRESS_FILE, SYNC_PROGRESS_INTERVAL
+
+
+def _pid_alive(pid):
+    """Жив ли процесс (на Windows проверка не делается)"""
+    if not pid or os.name == 'nt':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Процесс есть, но чужой
+    return True
+
+
+class ProgressStore:
+    """Состояние синхронизации и прогресс скачиваний, общий для процессов.
+
+    Архиватор (CLI, планировщик) пишет снимок в JSON-файл не чаще
+    раза в SYNC_PROGRESS_INTERVAL секунд на VOD, веб-сервер его читает.
+    Запись атомарная (временный файл + os.replace), так что читатель
+    никогда не видит файл наполовину.
+    """
+
+    def __init__(self, path=SYNC_PROGRESS_FILE, interval=SYNC_PROGRESS_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._state = {'sync': {'running': False}, 'downloads': {}}
+        self._last_sample = {}  # vod_id -> время последнего снимка
+        self._lock = threading.Lock()
+
+    def _flush(self):
+        self._state['updated_at'] = datetime.utcnow().isoformat()
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    # ============ ЗАПИСЬ (архиватор) ============
+
+    def start_sync(self, channel, total):
+        with self._lock:
+            self._state = {
+                'sync': {
+                    'running': True,
+                    'channel': channel,
+                    'pid': os.getpid(),
+                    'started_at': datetime.utcnow().isoformat(),
+                    'total': total,
+                    'done': 0,
+                },
+                'downloads': {},
+            }
+            self._last_sample.clear()
+            self._flush()
+
+    def vod_done(self):
+        with self._lock:
+            self._state['sync']['done'] = self._state['sync'].get('done', 0) + 1
+            self._flush()
+
+    def finish_sync(self, archived):
+        with self._lock:
+            self._state['sync'].update({
+                'running': False,
+                'archived': archived,
+                'finished_at': datetime.utcnow().isoformat(),
+            })
+            self._flush()
+
+    def sample(self, vod_id, force=False, **fields):
+        """Обновляет прогресс VOD; возвращает True, если снимок записан.
+
+        Промежуточные вызовы отбрасываются: раз в interval секунд
+        или при force (смена статуса).
+        """
+        now = time.monotonic()
+        if not force and now - self._last_sample.get(vod_id, 0) < self.interval:
+            return False
+        with self._lock:
+            self._last_sample[vod_id] = now
+            entry = self._state['downloads'].setdefault(vod_id, {})
+            entry.update(fields)
+            entry['updated_at'] = datetime.utcnow().isoformat()
+            self._flush()
+        return True
+
+    # ============ ЧТЕНИЕ (веб-сервер) ============
+
+    def read(self):
+        """Читает снимок; синхронизация упавшего процесса помечается stale"""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {'sync': {'running': False}, 'downloads': {}}
+
+        sync = state.get('sync', {})
+        if sync.get('running') and not _pid_alive(sync.get('pid')):
+            # Архиватор упал, не успев вызвать finish_sync
+            sync['running'] = False
+            sync['stale'] = True
+        return state
+
+    def mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
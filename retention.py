@@ -0,0 +1,202 @@
+import os
+import shutil
+import logging
+import subprocess
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from config import (
+    VIDEO_DIR, COLD_STORAGE_DIR, VIDEO_QUOTA_GB, MIN_FREE_SPACE_GB,
+    RETENTION_POLICY, COLD_STORAGE_RECOMPRESS, COLD_STORAGE_CRF,
+    RETENTION_GRACE_HOURS, RETENTION_ESTIMATE_MBPS
+)
+from models import db, TwitchStream
+from integrity import CHECKSUM_SUFFIX, file_hash, write_checksum
+
+logger = logging.getLogger(__name__)
+
+GB = 1024 ** 3
+
+
+class RetentionManager:
+    """Держит папку с видео в пределах квоты, вытесняя старые VOD в холодное хранилище.
+
+    Метаданные и чат вытесненных стримов остаются в БД, поэтому
+    они по-прежнему видны в списке и поиске. Только что скачанные,
+    восстановленные или открытые VOD защищены от вытеснения на grace_hours.
+    """
+
+    def __init__(self, quota_gb=VIDEO_QUOTA_GB, min_free_gb=MIN_FREE_SPACE_GB,
+                 policy=RETENTION_POLICY, cold_dir=COLD_STORAGE_DIR,
+                 recompress=COLD_STORAGE_RECOMPRESS, grace_hours=RETENTION_GRACE_HOURS):
+        if policy not in ('lru', 'least_viewed'):
+            raise ValueError(f"Неизвестная политика хранения: {policy}")
+        self.quota_bytes = int(quota_gb * GB)
+        self.min_free_bytes = int(min_free_gb * GB)
+        self.policy = policy
+        self.cold_dir = cold_dir
+        self.recompress = recompress
+        self.grace = timedelta(hours=grace_hours)
+
+    # ============ УЧЁТ МЕСТА ============
+
+    @staticmethod
+    def file_size(stream):
+        """Размер видео стрима в байтах"""
+        if stream.file_size_bytes:
+            return stream.file_size_bytes
+        if stream.local_video_path and os.path.exists(stream.local_video_path):
+            return os.path.getsize(stream.local_video_path)
+        return 0
+
+    def hot_streams(self):
+        """Скачанные стримы в горячем хранилище в порядке вытеснения"""
+        query = TwitchStream.query.filter(
+            TwitchStream.is_downloaded == True,
+            db.or_(TwitchStream.storage_tier.is_(None), TwitchStream.storage_tier != 'cold'),
+        )
+        last_access = func.coalesce(TwitchStream.last_accessed_at, TwitchStream.created_at)
+        if self.policy == 'least_viewed':
+            query = query.order_by(func.coalesce(TwitchStream.views, 0).asc(), last_access.asc())
+        else:
+            query = query.order_by(last_access.asc())
+        return query.all()
+
+    @staticmethod
+    def estimate_size(vod_info):
+        """Ожидаемый размер VOD до скачивания: по данным yt-dlp или по длительности"""
+        size = vod_info.get('filesize') or vod_info.get('filesize_approx')
+        if size:
+            return int(size)
+        return int((vod_info.get('duration') or 0) * RETENTION_ESTIMATE_MBPS * 1000 ** 2 / 8)
+
+    def hot_usage_bytes(self):
+        return sum(self.file_size(s) for s in self.hot_streams())
+
+    def _free_space_counts(self):
+        """Освобождает ли перенос место на диске (холодное хранилище на другом устройстве)"""
+        if not self.min_free_bytes:
+            return False
+        os.makedirs(self.cold_dir, exist_ok=True)
+        return os.stat(self.cold_dir).st_dev != os.stat(VIDEO_DIR).st_dev
+
+    # ============ ВЫТЕСНЕНИЕ ============
+
+    def enforce(self, reserve_bytes=0, exclude_ids=(), dry_run=False):
+        """Вытесняет VOD, пока горячее хранилище не уложится в квоту.
+
+        reserve_bytes — сколько места нужно оставить под новое видео.
+        Возвращает список вытесненных стримов.
+        """
+        check_free = self._free_space_counts()
+        if not self.quota_bytes and not check_free:
+            return []
+
+        hot = self.hot_streams()
+        usage = sum(self.file_size(s) for s in hot)
+        protected_since = datetime.utcnow() - self.grace
+        candidates = [
+            s for s in hot
+            if s.id not in exclude_ids and (s.last_accessed_at or s.created_at or datetime.min) < protected_since
+        ]
+        freed = 0
+        evicted = []
+
+        for stream in candidates:
+            over_quota = self.quota_bytes and usage + reserve_bytes > self.quota_bytes
+            low_space = check_free and (
+                shutil.disk_usage(VIDEO_DIR).free + (freed if dry_run else 0)
+                < self.min_free_bytes + reserve_bytes
+            )
+            if not over_quota and not low_space:
+                break
+
+            size = self.file_size(stream)
+            if dry_run:
+                logger.info(f"🧊 [dry-run] Вытеснил бы: [{stream.id}] {stream.title} ({size / GB:.2f} GB)")
+            else:
+                self.evict(stream)
+            usage -= size
+            freed += size
+            evicted.append(stream)
+
+        if evicted:
+            logger.info(f"🧊 Вытеснено {len(evicted)} VOD, освобождено {freed / GB:.2f} GB")
+        if self.quota_bytes and usage + reserve_bytes > self.quota_bytes:
+            logger.warning("⚠️  Квота превышена: остальные VOD защищены от вытеснения (RETENTION_GRACE_HOURS)")
+        return evicted
+
+    def evict(self, stream):
+        """Переносит видео стрима в холодное хранилище"""
+        src = stream.local_video_path
+        if not src or not os.path.exists(src):
+            logger.warning(f"⚠️  Файл не найден, помечаю как холодный: [{stream.id}] {src}")
+            stream.storage_tier = 'cold'
+            db.session.commit()
+            return
+
+        os.makedirs(self.cold_dir, exist_ok=True)
+        dst = os.path.join(self.cold_dir, os.path.basename(src))
+
+        if self.recompress and shutil.which('ffmpeg'):
+            self._recompress(src, dst)
+            os.remove(src)
+            digest = file_hash(dst)
+            write_checksum(dst, digest)
+            stream.content_hash = digest
+            if os.path.exists(src + CHECKSUM_SUFFIX):
+                os.remove(src + CHECKSUM_SUFFIX)
+        else:
+            if self.recompress:
+                logger.warning("⚠️  ffmpeg не найден, переношу без пережатия")
+            shutil.move(src, dst)
+            if os.path.exists(src + CHECKSUM_SUFFIX):
+                shutil.move(src + CHECKSUM_SUFFIX, dst + CHECKSUM_SUFFIX)
+
+        stream.local_video_path = dst
+        stream.file_size_bytes = os.path.getsize(dst)
+        stream.storage_tier = 'cold'
+        db.session.commit()
+        logger.info(f"🧊 Перенесено в холодное хранилище: [{stream.id}] {dst}")
+
+    @staticmethod
+    def _recompress(src, dst):
+        tmp = dst + '.tmp.mp4'
+        subprocess.run(
+            [
+                'ffmpeg', '-y', '-loglevel', 'error', '-i', src,
+                '-c:v', 'libx264', '-preset', 'slow', '-crf', str(COLD_STORAGE_CRF),
+                '-c:a', 'copy', tmp,
+            ],
+            check=True,
+        )
+        os.replace(tmp, dst)
+
+    # ============ ВОССТАНОВЛЕНИЕ ============
+
+    def restore(self, stream):
+        """Возвращает видео из холодного хранилища в VIDEO_DIR.
+
+        Перед переносом при необходимости вытесняет другие VOD.
+        Пережатое видео возвращается в пережатом виде.
+        """
+        if stream.storage_tier != 'cold':
+            logger.info(f"⏭️  Стрим уже в горячем хранилище: [{stream.id}]")
+            return stream.local_video_path
+
+        src = stream.local_video_path
+        if not src or not os.path.exists(src):
+            raise FileNotFoundError(f"Файл стрима {stream.id} не найден: {src}")
+
+        self.enforce(reserve_bytes=os.path.getsize(src), exclude_ids=(stream.id,))
+
+        dst = os.path.join(VIDEO_DIR, os.path.basename(src))
+        shutil.move(src, dst)
+        if os.path.exists(src + CHECKSUM_SUFFIX):
+            shutil.move(src + CHECKSUM_SUFFIX, dst + CHECKSUM_SUFFIX)
+
+        stream.local_video_path = dst
+        stream.storage_tier = 'hot'
+        stream.last_accessed_at = datetime.utcnow()
+        db.session.commit()
+        logger.info(f"🔥 Восстановлено из холодного хранилища: [{stream.id}] {dst}")
+        return dst
@@ -6,10 +6,15 @@
 import os
 import sys
 import click
+from datetime import datetime
 from app import app, db
 from models import TwitchStream, ChatMessage, ArchiveStats
 from twitch_scraper import TwitchArchiver
-from config import TWITCH_CHANNEL, AUTO_SYNC_ENABLED, AUTO_SYNC_INTERVAL_HOURS
+from config import (
+    TWITCH_CHANNEL, AUTO_SYNC_ENABLED, AUTO_SYNC_INTERVAL_HOURS,
+    VERIFY_WORKERS, VERIFY_MAX_MBPS, EXPORT_CHUNK_ROWS, IMPORT_WORKERS,
+    SERVER_WORKERS, SERVER_THREADS, SERVER_KEEPALIVE, SERVER_GRACEFUL_TIMEOUT
+)
 import logging
 
 # Логирование
@@ -34,10 +39,30 @@ def sync(limit):
 @cli.command()
 def init_db():
     """📁 Инициализировать базу данных"""
+    from schema import upgrade_schema
+    
     with app.app_context():
         db.create_all()
+        upgrade_schema()
         logger.info("✅ База данных инициализирована")
 
+@cli.command()
+def migrate_chatters():
+    """🛠️  Перенести чат старого формата на таблицу авторов"""
+    from schema import migrate_chatters as migrate
+    from analytics import rebuild_summaries, rebuild_month_rollups
+    
+    with app.app_context():
+        db.create_all()
+        moved = migrate()
+        if moved is None:
+            logger.info("✅ Чат уже в новом формате")
+            return
+        logger.info(f"✅ Перенесено сообщений: {moved}")
+        # Сводок для старого чата ещё нет — считаем их сразу
+        logger.info(f"✅ Пересчитано сводок: {rebuild_summaries()}")
+        logger.info(f"✅ Пересчитано помесячных сводок: {rebuild_month_rollups()}")
+
 @cli.command()
 def clear_db():
     """🗑️  Очистить базу данных"""
@@ -63,6 +88,137 @@ def stats():
 ║════════════════════════════════════════════════════╝
         """)
 
+@cli.command()
+@click.argument('out_dir', type=click.Path(file_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['ndjson', 'parquet']), default='ndjson', help='Формат файлов')
+@click.option('--chunk-rows', default=EXPORT_CHUNK_ROWS, help='Строк в одном файле-части')
+def export(out_dir, fmt, chunk_rows):
+    """📤 Выгрузить стримы и чат в папку"""
+    from archive_io import export_archive
+    
+    with app.app_context():
+        try:
+            manifest = export_archive(out_dir, fmt=fmt, chunk_rows=chunk_rows)
+        except RuntimeError as e:
+            logger.error(f"❌ {e}")
+            sys.exit(1)
+        total = sum(t['rows'] for t in manifest['tables'].values())
+        logger.info(f"✅ Экспорт завершён: {total} строк в {out_dir}")
+
+@cli.command('import')
+@click.argument('in_dir', type=click.Path(exists=True, file_okay=False))
+@click.option('--workers', default=IMPORT_WORKERS, help='Процессов для разбора файлов')
+@click.option('--replace', is_flag=True, help='Пересоздать БД перед импортом')
+def import_archive(in_dir, workers, replace):
+    """📥 Загрузить архив, выгруженный командой export"""
+    from archive_io import import_archive as load
+    
+    if replace and not click.confirm('Вы уверены? Это удалит все текущие данные!'):
+        return
+    
+    with app.app_context():
+        try:
+            imported = load(in_dir, workers=workers, replace=replace)
+        except (RuntimeError, ValueError) as e:
+            logger.error(f"❌ {e}")
+            sys.exit(1)
+        logger.info(f"✅ Импорт завершён: {sum(imported.values())} строк")
+
+@cli.command()
+@click.option('--stream-id', type=int, multiple=True, help='ID стрима (можно несколько, по умолчанию все)')
+def rebuild_summaries(stream_id):
+    """📊 Пересчитать сводки аналитики чата и помесячные сводки"""
+    from analytics import rebuild_summaries as rebuild, rebuild_month_rollups
+    
+    with app.app_context():
+        count = rebuild(stream_ids=list(stream_id) or None)
+        logger.info(f"✅ Пересчитано сводок: {count}")
+        months = rebuild_month_rollups()
+        logger.info(f"✅ Пересчитано помесячных сводок: {months}")
+
+@cli.command()
+@click.option('--workers', default=VERIFY_WORKERS, help='Потоков для проверки')
+@click.option('--max-mbps', default=VERIFY_MAX_MBPS, help='Ограничение скорости чтения, МБ/с (0 - без ограничения)')
+def verify(workers, max_mbps):
+    """🔐 Проверить целостность скачанных видео"""
+    from integrity import verify_files, read_checksum, write_checksum
+    
+    with app.app_context():
+        streams = {s.id: s for s in TwitchStream.query.filter_by(is_downloaded=True).all()}
+        items = [
+            (s.id, s.local_video_path, s.content_hash or (s.local_video_path and read_checksum(s.local_video_path)))
+            for s in streams.values()
+        ]
+        logger.info(f"🔐 Проверяю {len(items)} видео в {workers} потоков...")
+        
+        results = verify_files(items, workers=workers, max_bytes_per_second=max_mbps * 1024 * 1024)
+        
+        counts = {'ok': 0, 'new': 0, 'mismatch': 0, 'missing': 0}
+        for result in results:
+            stream = streams[result['key']]
+            counts[result['status']] += 1
+            
+            if result['status'] in ('ok', 'new'):
+                if result['status'] == 'new':
+                    write_checksum(stream.local_video_path, result['digest'])
+                stream.content_hash = result['digest']
+                stream.file_size_bytes = os.path.getsize(stream.local_video_path)
+                stream.verified_at = datetime.utcnow()
+            elif result['status'] == 'mismatch':
+                logger.error(f"❌ Повреждён: [{stream.id}] {stream.title} ({result['path']})")
+            else:
+                logger.error(f"❌ Файл отсутствует: [{stream.id}] {stream.title} ({result['path']})")
+        
+        db.session.commit()
+        
+        print(f"""
+╔════════════════════════════════════════════════════╗
+║           ПРОВЕРКА ЦЕЛОСТНОСТИ АРХИВА
+║════════════════════════════════════════════════════╗
+║  ✅ В порядке:             {counts['ok']}
+║  🆕 Хеш посчитан впервые:  {counts['new']}
+║  ❌ Повреждено:            {counts['mismatch']}
+║  ❓ Отсутствует:           {counts['missing']}
+║════════════════════════════════════════════════════╝
+        """)
+        
+        if counts['mismatch'] or counts['missing']:
+            sys.exit(1)
+
+@cli.command()
+@click.option('--dry-run', is_flag=True, help='Только показать, что будет вытеснено')
+def retention(dry_run):
+    """🧊 Вытеснить старые видео в холодное хранилище по квоте"""
+    from retention import RetentionManager, GB
+    
+    with app.app_context():
+        manager = RetentionManager()
+        evicted = manager.enforce(dry_run=dry_run)
+        usage = manager.hot_usage_bytes() - (sum(manager.file_size(s) for s in evicted) if dry_run else 0)
+        
+        print(f"""
+╔════════════════════════════════════════════════════╗
+║           ХРАНЕНИЕ ВИДЕО
+║════════════════════════════════════════════════════╗
+║  🧊 Вытеснено:             {len(evicted)}
+║  🔥 Горячее хранилище:     {usage / GB:.2f} GB
+║════════════════════════════════════════════════════╝
+        """)
+
+@cli.command()
+@click.argument('stream_id', type=int)
+def restore(stream_id):
+    """🔥 Вернуть видео из холодного хранилища"""
+    from retention import RetentionManager
+    
+    with app.app_context():
+        stream = TwitchStream.query.get(stream_id)
+        if not stream:
+            logger.error(f"❌ Стрим {stream_id} не найден")
+            sys.exit(1)
+        path = RetentionManager().restore(stream)
+        logger.info(f"✅ Видео доступно: {path}")
+
 @cli.command()
 @click.option('--host', default='0.0.0.0', help='Host для запуска')
 @click.option('--port', default=5000, help='Port для запуска')
@@ -73,11 +229,83 @@ def run(host, port, debug):
     logger.info(f"📺 Канал: {TWITCH_CHANNEL}")
     logger.info(f"🔗 Откройте http://localhost:{port}")
     
+    from app import suggest_index
+    
     with app.app_context():
         db.create_all()
+        # В debug-режиме запросы обслуживает дочерний процесс перезагрузчика
+        if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            suggest_index.ensure_started(app)
     
     app.run(host=host, port=port, debug=debug)
 
+@cli.command()
+@click.option('--host', default='0.0.0.0', help='Host для запуска')
+@click.option('--port', default=8000, help='Port для запуска')
+@click.option('--workers', type=int, default=SERVER_WORKERS, help='Процессов-воркеров (по умолчанию SERVER_WORKERS или 2 * CPU + 1)')
+@click.option('--threads', default=SERVER_THREADS, help='Потоков в каждом воркере')
+@click.option('--keepalive', default=SERVER_KEEPALIVE, help='Keep-alive, сек')
+@click.option('--graceful-timeout', default=SERVER_GRACEFUL_TIMEOUT, help='Время на плавную перезагрузку, сек')
+@click.option('--pidfile', default=None, help='Файл с PID мастера (для kill -HUP / -USR2)')
+def serve(host, port, workers, threads, keepalive, graceful_timeout, pidfile):
+    """🏭 Запустить production-сервер (gunicorn, несколько воркеров)"""
+    from server import serve as run_server
+    
+    with app.app_context():
+        db.create_all()
+    
+    try:
+        run_server(
+            host=host, port=port, workers=workers, threads=threads,
+            keepalive=keepalive, graceful_timeout=graceful_timeout, pidfile=pidfile,
+        )
+    except RuntimeError as e:
+        logger.error(f"❌ {e}")
+        sys.exit(1)
+
+@cli.command()
+@click.option('--url', default=None, help='Адрес уже запущенного сервера')
+@click.option('--spawn', type=click.Choice(['dev', 'prod', 'both']), default='both', help='Какой сервер запустить для замера')
+@click.option('--port', default=8765, help='Port для запускаемого сервера')
+@click.option('--path', 'paths', multiple=True, help='Путь для нагрузки (можно несколько)')
+@click.option('--requests', 'total', default=500, help='Всего запросов')
+@click.option('--concurrency', default=16, help='Одновременных клиентов')
+@click.option('--workers', type=int, default=None, help='Воркеров для prod-сервера')
+def bench(url, spawn, port, paths, total, concurrency, workers):
+    """⏱️  Нагрузочный замер веб-сервера"""
+    from benchmark import run_load, spawn_server, default_paths
+    
+    if url:
+        targets = [('external', url, None)]
+    else:
+        targets = [(mode, None, mode) for mode in (['dev', 'prod'] if spawn == 'both' else [spawn])]
+    
+    for name, base_url, mode in targets:
+        process = None
+        try:
+            if mode:
+                process, base_url = spawn_server(mode, port, workers=workers)
+            result = run_load(base_url, list(paths) or default_paths(base_url), total, concurrency)
+        except RuntimeError as e:
+            logger.error(f"❌ {e}")
+            continue
+        finally:
+            if process:
+                process.terminate()
+                process.wait()
+        
+        print(f"""
+╔════════════════════════════════════════════════════╗
+║           ЗАМЕР: {name.upper()}
+║════════════════════════════════════════════════════╗
+║  📨 Запросов:              {result['requests']} ({result['concurrency']} клиентов)
+║  ❌ Ошибок:                {result['errors']}
+║  🚀 Запросов в секунду:    {result['rps']}
+║  📦 Трафик:                {result['mb_per_s']} МБ/с
+║  ⏱️  p50 / p95 / p99:       {result['p50_ms']} / {result['p95_ms']} / {result['p99_ms']} мс
+║════════════════════════════════════════════════════╝
+        """)
+
 @cli.command()
 def scheduler():
     """🕐 Запустить планировщик автоматической синхронизации"""
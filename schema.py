@@ -0,0 +1,118 @@
+import logging
+from models import db, ChatMessage, FLAG_MODERATOR, FLAG_SUBSCRIBER, FLAG_BROADCASTER
+
+logger = logging.getLogger(__name__)
+
+# Колонки, добавленные в существующие таблицы после первого релиза.
+# db.create_all() не меняет уже созданные таблицы, поэтому их
+# досоздаёт upgrade_schema(): (таблица, колонка, SQL-тип с умолчанием)
+ADDED_COLUMNS = [
+    ('streams', 'content_hash', 'VARCHAR(64)'),
+    ('streams', 'file_size_bytes', 'BIGINT'),
+    ('streams', 'verified_at', 'DATETIME'),
+    ('streams', 'storage_tier', "VARCHAR(10) DEFAULT 'hot'"),
+    ('streams', 'last_accessed_at', 'DATETIME'),
+]
+
+# Индексы, добавленные в существующие таблицы: (имя, таблица, [колонки])
+ADDED_INDEXES = [
+    ('ix_streams_content_hash', 'streams', ['content_hash']),
+    ('ix_streams_storage_tier', 'streams', ['storage_tier']),
+    # Покрывающие индексы фильтров /api/streams (см. TwitchStream.__table_args__)
+    ('ix_streams_browse_date', 'streams',
+     ['is_downloaded', 'stream_date', 'duration_seconds', 'chat_message_count']),
+    ('ix_streams_browse_duration', 'streams',
+     ['is_downloaded', 'duration_seconds', 'stream_date', 'chat_message_count']),
+]
+
+
+def upgrade_schema():
+    """Доводит схему существующей БД до текущих моделей (идемпотентно).
+
+    Вызывается после db.create_all(): новые таблицы создаёт он,
+    а здесь добавляются новые колонки в старые таблицы.
+    """
+    inspector = db.inspect(db.engine)
+    tables = set(inspector.get_table_names())
+
+    with db.engine.begin() as conn:
+        for table, column, sql_type in ADDED_COLUMNS:
+            if table not in tables:
+                continue
+            existing = {c['name'] for c in inspector.get_columns(table)}
+            if column not in existing:
+                conn.execute(db.text(f'ALTER TABLE {table} ADD COLUMN {column} {sql_type}'))
+                logger.info(f"🛠️  Добавлена колонка {table}.{column}")
+
+        for name, table, columns in ADDED_INDEXES:
+            if table not in tables:
+                continue
+            conn.execute(db.text(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({", ".join(columns)})'))
+
+    if needs_chatter_migration():
+        logger.warning("⚠️  Чат хранится в старом формате — выполните: python run.py migrate-chatters")
+
+
+# ============ ПЕРЕНОС ЧАТА НА ТАБЛИЦУ CHATTERS ============
+
+def needs_chatter_migration():
+    """True, если chat_messages ещё в старом формате (username и булевы флаги)"""
+    inspector = db.inspect(db.engine)
+    if 'chat_messages' not in inspector.get_table_names():
+        return False
+    columns = {c['name'] for c in inspector.get_columns('chat_messages')}
+    return 'username' in columns and 'chatter_id' not in columns
+
+
+def migrate_chatters():
+    """Переносит старый chat_messages на chatters + упакованные флаги.
+
+    Авторы заводятся из DISTINCT username, таблица сообщений
+    пересоздаётся без старых колонок (SQLite не умеет DROP COLUMN
+    с индексами и внешними ключами), счётчики сообщений пересчитываются.
+    Всё в одной транзакции. Возвращает число перенесённых сообщений
+    или None, если переносить нечего.
+    """
+    if not needs_chatter_migration():
+        return None
+
+    with db.engine.begin() as conn:
+        conn.execute(db.text(
+            "INSERT INTO chatters (username, message_count, created_at) "
+            "SELECT username, 0, MIN(created_at) FROM chat_messages "
+            "WHERE username NOT IN (SELECT username FROM chatters) "
+            "GROUP BY username"
+        ))
+
+        # Старые индексы переезжают вместе с таблицей, а их имена
+        # нужны новой таблице
+        old_indexes = conn.execute(db.text(
+            "SELECT name FROM sqlite_master "
+            "WHERE type = 'index' AND tbl_name = 'chat_messages' AND sql IS NOT NULL"
+        )).scalars().all()
+        for name in old_indexes:
+            conn.execute(db.text(f'DROP INDEX {name}'))
+
+        conn.execute(db.text('ALTER TABLE chat_messages RENAME TO chat_messages_old'))
+        ChatMessage.__table__.create(conn)
+
+        moved = conn.execute(db.text(
+            "INSERT INTO chat_messages (id, stream_id, chatter_id, message_text, "
+            "message_time_seconds, message_time_formatted, message_timestamp, flags, created_at) "
+            "SELECT m.id, m.stream_id, c.id, m.message_text, m.message_time_seconds, "
+            "m.message_time_formatted, m.message_timestamp, "
+            f"(CASE WHEN m.is_moderator THEN {FLAG_MODERATOR} ELSE 0 END) "
+            f"| (CASE WHEN m.is_subscriber THEN {FLAG_SUBSCRIBER} ELSE 0 END) "
+            f"| (CASE WHEN m.is_broadcaster THEN {FLAG_BROADCASTER} ELSE 0 END), "
+            "m.created_at "
+            "FROM chat_messages_old m JOIN chatters c ON c.username = m.username"
+        )).rowcount
+        conn.execute(db.text('DROP TABLE chat_messages_old'))
+
+        conn.execute(db.text(
+            "UPDATE chatters SET message_count = ("
+            "SELECT COUNT(*) FROM chat_messages WHERE chat_messages.chatter_id = chatters.id)"
+        ))
+
+    logger.info(f"🛠️  Чат перенесён на таблицу chatters: {moved} сообщений")
+    return moved
@@ -0,0 +1,76 @@
+import os
+import logging
+from config import (
+    SERVER_WORKERS, SERVER_THREADS, SERVER_KEEPALIVE,
+    SERVER_TIMEOUT, SERVER_GRACEFUL_TIMEOUT, SERVER_MAX_REQUESTS
+)
+
+logger = logging.getLogger(__name__)
+
+
+def default_workers():
+    """Число воркеров по CPU: классическая формула gunicorn 2 * CPU + 1"""
+    return (os.cpu_count() or 1) * 2 + 1
+
+
+def _post_fork(server, worker):
+    # Соединения SQLite, открытые в мастере до fork, нельзя делить между процессами
+    from app import app, suggest_index
+    from models import db
+    with app.app_context():
+        db.engine.dispose()
+        # Индекс подсказок строится до первого запроса к воркеру
+        suggest_index.ensure_started(app)
+        db.session.remove()
+
+
+def serve(host='0.0.0.0', port=8000, workers=SERVER_WORKERS, threads=SERVER_THREADS,
+          keepalive=SERVER_KEEPALIVE, timeout=SERVER_TIMEOUT,
+          graceful_timeout=SERVER_GRACEFUL_TIMEOUT, max_requests=SERVER_MAX_REQUESTS,
+          pidfile=None):
+    """Запускает приложение под gunicorn (prefork + потоки в каждом воркере).
+
+    Приложение загружается в мастере до fork (preload_app), поэтому
+    kill -HUP <pid мастера> только плавно пересоздаёт воркеры со старым
+    кодом — воркеры дорабатывают текущие запросы в пределах
+    graceful_timeout. Чтобы подхватить новый код без простоя:
+    kill -USR2 <pid> (стартует новый мастер), затем kill -QUIT старому
+    мастеру (его pid — в pidfile с суффиксом .oldbin). Либо перезапуск.
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise RuntimeError("Для production-режима нужен gunicorn: pip install gunicorn (только Linux/macOS)")
+
+    from app import app
+
+    options = {
+        'bind': f"{host}:{port}",
+        'workers': workers or default_workers(),
+        'threads': threads,
+        'worker_class': 'gthread',
+        'keepalive': keepalive,
+        'timeout': timeout,
+        'graceful_timeout': graceful_timeout,
+        'max_requests': max_requests,
+        'max_requests_jitter': max_requests // 10 if max_requests else 0,
+        'preload_app': True,
+        'post_fork': _post_fork,
+        'pidfile': pidfile,
+        'accesslog': '-',
+    }
+
+    class ArchiveApplication(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                if value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    logger.info(
+        f"🚀 Production-сервер на {options['bind']}: "
+        f"{options['workers']} воркеров × {threads} потоков"
+    )
+    ArchiveApplication().run()
@@ -17,6 +17,7 @@ setup(
         'SQLAlchemy==2.0.20',
         'python-dotenv==1.0.0',
         'click==8.1.7',
+        'gunicorn==21.2.0; platform_system != "Windows"',
     ],
     entry_points={
         'console_scripts': [
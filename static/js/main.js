@@ -34,9 +34,39 @@ function initSearch() {
                 return false;
             }
         });
+        initSuggestions(searchForm);
     }
 }
 
+function initSuggestions(searchForm) {
+    const input = searchForm.querySelector('input[name="q"]');
+    const box = searchForm.querySelector('.search-suggestions');
+    if (!input || !box) return;
+    
+    const update = debounce(async function() {
+        const query = input.value.trim();
+        if (!query) {
+            box.hidden = true;
+            return;
+        }
+        
+        const data = await fetchJSON(`/api/suggest?q=${encodeURIComponent(query)}`);
+        // Ответ мог прийти после того, как пользователь продолжил печатать
+        if (!data || data.query !== input.value.trim()) return;
+        
+        const items = [
+            ...data.streams.map(s => `<a href="/stream/${s.id}">📺 ${escapeHTML(s.title)}</a>`),
+            // Отдельной страницы автора нет — показываем без ссылки
+            ...data.chatters.map(c => `<span>💬 ${escapeHTML(c.username)} (${c.messages})</span>`),
+        ];
+        box.innerHTML = items.join('');
+        box.hidden = items.length === 0;
+    }, 150);
+    
+    input.addEventListener('input', update);
+    input.addEventListener('blur', () => setTimeout(() => { box.hidden = true; }, 200));
+}
+
 // ============ ВИДЕОПЛЕЕР ============
 
 function initVideoPlayer() {
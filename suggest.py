@@ -0,0 +1,162 @@
+import os
+import time
+import heapq
+import bisect
+import logging
+import threading
+from models import db, TwitchStream, Chatter
+from config import (
+    SUGGEST_REFRESH_SECONDS, SUGGEST_MIN_CHATTER_MESSAGES, SUGGEST_MAX_CHATTERS, SUGGEST_LIMIT_MAX
+)
+
+logger = logging.getLogger(__name__)
+
+# Для префиксов такой длины лучшие авторы считаются заранее:
+# короткий префикс покрывает слишком большую часть индекса
+TOP_PREFIX_LENGTHS = (1, 2)
+
+
+def normalize(text):
+    return ' '.join(text.lower().replace('ё', 'е').split())
+
+
+class SuggestIndex:
+    """Префиксный индекс для подсказок поиска: названия стримов и активные авторы чата.
+
+    Хранится как отсортированные списки кортежей (ключ, ...), поиск — bisect.
+    Название индексируется с каждого слова, так что «майн» найдёт
+    и «Играем в майнкрафт». Авторы выдаются по убыванию активности.
+    Индекс строится при старте процесса и обновляется фоновым потоком:
+    новые стримы дочитываются из БД по id, так что подхватывается то,
+    что закоммитил архиватор в другом процессе.
+    """
+
+    def __init__(self):
+        self._titles = []  # (ключ, stream_id, title)
+        self._chatters = ([], {})  # ([(ключ, username, message_count)], {префикс: лучшие авторы})
+        self._last_stream_id = 0
+        self._pid = None
+        self._lock = threading.Lock()
+
+    # ============ ПОСТРОЕНИЕ ============
+
+    @staticmethod
+    def _title_entries(stream_id, title):
+        words = normalize(title).split(' ')
+        return [(' '.join(words[i:]), stream_id, title) for i in range(len(words)) if words[i]]
+
+    def _load_streams(self):
+        """Дочитывает стримы, появившиеся после последнего обновления"""
+        rows = db.session.query(TwitchStream.id, TwitchStream.title)\
+            .filter(TwitchStream.id > self._last_stream_id, TwitchStream.is_downloaded == True)\
+            .order_by(TwitchStream.id)\
+            .all()
+        entries = [e for stream_id, title in rows for e in self._title_entries(stream_id, title)]
+        if len(entries) > 100:
+            # Много новых ключей (первое построение) — дешевле отсортировать заново
+            self._titles = sorted(self._titles + entries)
+        else:
+            for entry in entries:
+                bisect.insort(self._titles, entry)
+        if rows:
+            self._last_stream_id = rows[-1][0]
+        return len(rows)
+
+    def _load_chatters(self):
+        """Перечитывает список активных авторов (по индексу message_count)"""
+        rows = db.session.query(Chatter.username, Chatter.message_count)\
+            .filter(Chatter.message_count >= SUGGEST_MIN_CHATTER_MESSAGES)\
+            .order_by(Chatter.message_count.desc())\
+            .limit(SUGGEST_MAX_CHATTERS)\
+            .all()
+
+        # rows уже по убыванию активности — первые попавшие в префикс и есть лучшие
+        top_by_prefix = {}
+        for name, count in rows:
+            key = normalize(name)
+            for length in TOP_PREFIX_LENGTHS:
+                if len(key) >= length:
+                    top = top_by_prefix.setdefault(key[:length], [])
+                    if len(top) < SUGGEST_LIMIT_MAX:
+                        top.append({'username': name, 'messages': count})
+
+        # Подменяется одним присваиванием — читатели никогда не видят индекс наполовину
+        self._chatters = (sorted((normalize(name), name, count) for name, count in rows), top_by_prefix)
+
+    def _build(self):
+        self._titles = []
+        self._last_stream_id = 0
+        self._load_streams()
+        self._load_chatters()
+        logger.info(f"🔎 Индекс подсказок: {len(self._titles)} ключей названий, {len(self._chatters[0])} авторов")
+
+    def refresh(self):
+        """Дочитывает новые стримы и перечитывает авторов"""
+        with self._lock:
+            added = self._load_streams()
+            self._load_chatters()
+        if added:
+            logger.info(f"🔎 В индекс подсказок добавлено стримов: {added}")
+
+    def ensure_started(self, app):
+        """Строит индекс и запускает фоновое обновление (один раз на процесс).
+
+        Вызывается при старте (post_fork воркера gunicorn, run.py run)
+        внутри app context; вызов из /api/suggest — запасной вариант.
+        Проверка pid нужна для prefork-серверов: поток не переживает fork,
+        поэтому каждый воркер заводит свой.
+        """
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._build()
+            self._pid = os.getpid()
+        threading.Thread(target=self._refresh_loop, args=(app,), name='suggest-refresh', daemon=True).start()
+
+    def _refresh_loop(self, app):
+        while True:
+            time.sleep(SUGGEST_REFRESH_SECONDS)
+            with app.app_context():
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.error(f"❌ Ошибка обновления индекса подсказок: {e}")
+                finally:
+                    db.session.remove()
+
+    # ============ ПОИСК ============
+
+    @staticmethod
+    def _scan(entries, prefix, limit, key):
+        results, seen = [], set()
+        i = bisect.bisect_left(entries, (prefix,))
+        while i < len(entries) and len(results) < limit and entries[i][0].startswith(prefix):
+            if entries[i][1] not in seen:
+                seen.add(entries[i][1])
+                results.append(key(entries[i]))
+            i += 1
+        return results
+
+    def _top_chatters(self, prefix, limit):
+        entries, top_by_prefix = self._chatters
+        if len(prefix) in TOP_PREFIX_LENGTHS:
+            return top_by_prefix.get(prefix, [])[:limit]
+        # Длинный префикс сужает диапазон до немногих авторов
+        lo = bisect.bisect_left(entries, (prefix,))
+        hi = lo
+        while hi < len(entries) and entries[hi][0].startswith(prefix):
+            hi += 1
+        top = heapq.nlargest(limit, entries[lo:hi], key=lambda e: e[2])
+        return [{'username': e[1], 'messages': e[2]} for e in top]
+
+    def suggest(self, query, limit=8):
+        prefix = normalize(query)
+        limit = min(limit, SUGGEST_LIMIT_MAX)
+        if not prefix:
+            return {'streams': [], 'chatters': []}
+        return {
+            'streams': self._scan(self._titles, prefix, limit, lambda e: {'id': e[1], 'title': e[2]}),
+            'chatters': self._top_chatters(prefix, limit),
+        }
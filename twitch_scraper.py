@@ -1,12 +1,20 @@
 import yt_dlp
 import os
+import shutil
 import time
 import random
 import logging
 from datetime import datetime, timedelta
 from pathlib import Path
-from config import TWITCH_CHANNEL, VIDEO_DIR, GENERATE_SYNTHETIC_CHAT, CHAT_MESSAGES_PER_VIDEO, LOG_FILE
-from models import db, TwitchStream, ChatMessage, ArchiveStats
+from yt_dlp.postprocessor import PostProcessor
+from collections import Counter
+from functools import partial
+from config import TWITCH_CHANNEL, VIDEO_DIR, GENERATE_SYNTHETIC_CHAT, CHAT_MESSAGES_PER_VIDEO, LOG_FILE, HASH_CHUNK_SIZE
+from models import db, TwitchStream, ChatMessage, Chatter, ArchiveStats
+from integrity import StreamHasher, write_checksum, read_checksum, find_verified_copy
+from retention import RetentionManager
+from analytics import ChatSummaryBuilder, save_summary, bump_month_rollup
+from progress import ProgressStore
 
 # Логирование
 logging.basicConfig(
@@ -16,12 +24,34 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+class ChecksumPP(PostProcessor):
+    """Считает контрольную сумму итогового файла — после фиксапов yt-dlp.
+
+    Постпроцессоры фиксапов (FFmpegFixupM3u8PP) выполняются раньше
+    добавленных через add_post_processor, так что здесь хешируется
+    уже тот файл, который останется на диске.
+    """
+
+    def __init__(self, hasher, downloader=None):
+        super().__init__(downloader)
+        self.hasher = hasher
+        self.digest = None
+
+    def run(self, info):
+        self.digest = self.hasher.finalize(info['filepath'])
+        return [], info
+
+
 class TwitchArchiver:
     """Архиватор VOD с чата Twitch"""
     
     def __init__(self, channel_name=TWITCH_CHANNEL):
         self.channel_name = channel_name.lower()
         self.base_url = f"https://www.twitch.tv/{self.channel_name}"
+        self._hashers = {}  # vod_id -> StreamHasher для текущих скачиваний
+        self._chatter_ids = {}  # username -> Chatter.id
+        self.retention = RetentionManager()
+        self.progress = ProgressStore()
         logger.info(f"🎮 Инициализация архиватора для канала: {self.channel_name}")
     
     def get_channel_vods(self, limit=50):
@@ -51,6 +81,7 @@ class TwitchArchiver:
                         'description': entry.get('description', ''),
                         'upload_date': entry.get('upload_date'),
                         'duration': entry.get('duration', 0),
+                        'filesize': entry.get('filesize') or entry.get('filesize_approx'),
                         'thumbnail': entry.get('thumbnail'),
                         'url': f"https://www.twitch.tv/videos/{entry.get('id')}",
                     }
@@ -83,33 +114,98 @@ class TwitchArchiver:
             print(f"⏭️  Видео уже существует")
             return video_path
         
+        # Тот же VOD мог быть скачан под другим именем (например, сменилось название)
+        existing_copy, _ = find_verified_copy(VIDEO_DIR, vod_id)
+        if existing_copy:
+            logger.info(f"⏭️  Найдена проверенная копия: {existing_copy}")
+            print(f"⏭️  Видео уже скачано под другим именем")
+            self.progress.sample(vod_id, force=True, title=vod_title, status='skipped')
+            return existing_copy
+        
         ydl_opts = {
             'format': 'best[ext=mp4]',
             'outtmpl': os.path.join(VIDEO_DIR, '%(title)s_%(id)s.%(ext)s'),
             'quiet': False,
             'no_warnings': False,
+            'noprogress': True,  # Прогресс выводит _progress_hook с ограничением частоты
             'socket_timeout': 30,
-            'progress_hooks': [self._progress_hook],
+            'progress_hooks': [partial(self._progress_hook, vod_id=vod_id)],
         }
         
+        hasher = self._hashers[vod_id] = StreamHasher()
+        checksum_pp = ChecksumPP(hasher)
+        self.progress.sample(vod_id, force=True, title=vod_title, status='starting')
+        
         try:
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                ydl.add_post_processor(checksum_pp, when='post_process')
                 info = ydl.extract_info(url, download=True)
                 filename = ydl.prepare_filename(info)
                 logger.info(f"✅ Скачано: {filename}")
                 print(f"✅ Скачано успешно!")
-                return filename
+            
+            # Контрольная сумма итогового файла (из ChecksumPP или дочитанная здесь)
+            digest = checksum_pp.digest or hasher.finalize(filename)
+            write_checksum(filename, digest)
+            logger.info(f"🔐 Контрольная сумма: {digest}")
+            self.progress.sample(vod_id, force=True, status='finished')
+            return filename
         except Exception as e:
             logger.error(f"❌ Ошибка при скачивании: {e}")
             print(f"❌ Ошибка при скачивании: {e}")
+            self.progress.sample(vod_id, force=True, status='error', error=str(e))
             return None
+        finally:
+            self._hashers.pop(vod_id, None)
+    
+    @staticmethod
+    def _will_remux(info):
+        """Перепакует ли yt-dlp файл после скачивания (HLS: MPEG-TS → MP4).
+
+        Тогда хешировать поток скачивания бессмысленно — на диске
+        останется другой файл, его один раз хеширует ChecksumPP.
+        """
+        return (
+            (info.get('protocol') or '').startswith('m3u8')
+            and info.get('ext') in ('mp4', 'm4a')
+            and shutil.which('ffmpeg') is not None
+        )
     
-    def _progress_hook(self, d):
+    def _progress_hook(self, d, vod_id=None):
         """Прогресс скачивания"""
+        vod_id = vod_id or d.get('info_dict', {}).get('id')
+        hasher = self._hashers.get(vod_id)
+        if hasher and self._will_remux(d.get('info_dict', {})):
+            hasher = None
+        
         if d['status'] == 'downloading':
-            percent = d.get('_percent_str', 'N/A')
-            speed = d.get('_speed_str', 'N/A')
-            print(f"  Прогресс: {percent} на скорости {speed}")
+            if hasher:
+                hasher.update_from(d.get('tmpfilename') or d['filename'], min_bytes=HASH_CHUNK_SIZE)
+            
+            # yt-dlp зовёт хук на каждый блок — в лог и в хранилище идёт только выборка
+            sampled = self.progress.sample(
+                vod_id,
+                status='downloading',
+                downloaded_bytes=d.get('downloaded_bytes'),
+                total_bytes=d.get('total_bytes') or d.get('total_bytes_estimate'),
+                speed=d.get('speed'),
+                eta=d.get('eta'),
+            )
+            if sampled:
+                percent = d.get('_percent_str', 'N/A')
+                speed = d.get('_speed_str', 'N/A')
+                print(f"  Прогресс: {percent} на скорости {speed}")
+        elif d['status'] == 'finished':
+            if hasher:
+                hasher.update_from(d['filename'])
+            self.progress.sample(
+                vod_id,
+                force=True,
+                status='processing',
+                downloaded_bytes=d.get('downloaded_bytes') or d.get('total_bytes'),
+                speed=None,
+                eta=0,
+            )
     
     def generate_synthetic_chat(self, duration_seconds):
         """Генерирует примерный чат"""
@@ -199,19 +295,52 @@ class TwitchArchiver:
             video_url=vod_info['url'],
             local_video_path=video_path,
             thumbnail_url=vod_info.get('thumbnail', ''),
+            content_hash=read_checksum(video_path),
+            file_size_bytes=os.path.getsize(video_path) if os.path.exists(video_path) else None,
             is_downloaded=True,
         )
         
         db.session.add(stream)
+        bump_month_rollup(stream_date, streams=1, duration_seconds=duration)
         db.session.commit()
         
         logger.info(f"✅ Сохранено в БД: ID {stream.id}")
         return stream.id
     
+    def _intern_chatters(self, usernames):
+        """Возвращает {username: chatter_id}, создавая недостающих авторов.
+
+        ID кешируются в памяти архиватора, так что повторяющиеся ники
+        не требуют запросов к БД ни внутри стрима, ни между стримами.
+        """
+        missing = [name for name in set(usernames) if name not in self._chatter_ids]
+        
+        # Уже известные БД авторы (порциями, чтобы не упереться в лимит параметров SQLite)
+        for i in range(0, len(missing), 500):
+            batch = missing[i:i + 500]
+            for chatter_id, username in db.session.query(Chatter.id, Chatter.username)\
+                    .filter(Chatter.username.in_(batch)):
+                self._chatter_ids[username] = chatter_id
+        
+        new_chatters = [Chatter(username=name) for name in missing if name not in self._chatter_ids]
+        if new_chatters:
+            db.session.add_all(new_chatters)
+            db.session.flush()
+            for chatter in new_chatters:
+                self._chatter_ids[chatter.username] = chatter.id
+        
+        return self._chatter_ids
+    
     def save_chat_to_db(self, stream_id, messages):
         """Сохраняет сообщения чата в БД"""
         logger.info(f"💬 Сохраняю {len(messages)} сообщений чата...")
         
+        stream = TwitchStream.query.get(stream_id)
+        chatter_ids = self._intern_chatters(msg['username'] for msg in messages)
+        per_chatter = Counter()
+        summary = ChatSummaryBuilder(stream.duration_seconds)
+        rows = []
+        
         for msg in messages:
             # Форматируем время
             time_seconds = msg['time_seconds']
@@ -220,27 +349,56 @@ class TwitchArchiver:
             seconds = int(time_seconds % 60)
             time_formatted = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
             
-            chat_msg = ChatMessage(
-                stream_id=stream_id,
-                username=msg['username'],
-                message_text=msg['message'],
-                message_time_seconds=time_seconds,
-                message_time_formatted=time_formatted,
-                message_timestamp=msg['timestamp'],
-                is_moderator=msg.get('is_mod', False),
-                is_subscriber=msg.get('is_sub', False),
-                is_broadcaster=msg.get('is_broadcaster', False),
+            chatter_id = chatter_ids[msg['username']]
+            per_chatter[chatter_id] += 1
+            
+            flags = ChatMessage.pack_flags(
+                msg.get('is_mod', False),
+                msg.get('is_sub', False),
+                msg.get('is_broadcaster', False),
             )
-            db.session.add(chat_msg)
+            summary.add(msg['username'], msg['message'], time_seconds, flags)
+            
+            rows.append({
+                'stream_id': stream_id,
+                'chatter_id': chatter_id,
+                'message_text': msg['message'],
+                'message_time_seconds': time_seconds,
+                'message_time_formatted': time_formatted,
+                'message_timestamp': msg['timestamp'],
+                'flags': flags,
+            })
         
-        db.session.commit()
+        try:
+            if rows:
+                db.session.execute(db.insert(ChatMessage), rows)
+            
+            # Обновляем счётчики сообщений авторов
+            if per_chatter:
+                chatters = Chatter.__table__
+                db.session.execute(
+                    db.update(chatters)
+                    .where(chatters.c.id == db.bindparam('chatter_id'))
+                    .values(message_count=chatters.c.message_count + db.bindparam('added')),
+                    [{'chatter_id': cid, 'added': n} for cid, n in per_chatter.items()],
+                )
+            
+            # Сводка чата считается тем же проходом, без повторного чтения из БД
+            save_summary(stream_id, summary.build())
+            
+            if messages and not stream.chat_message_count:
+                bump_month_rollup(stream.stream_date, with_chat=1)
+            
+            # Обновляем счётчик в стриме
+            stream.chat_message_count = len(messages)
+            stream.chat_is_synthetic = True
+            db.session.commit()
+        except Exception:
+            # Только что созданные авторы откатились вместе с транзакцией
+            db.session.rollback()
+            self._chatter_ids.clear()
+            raise
         logger.info(f"✅ Сохранено {len(messages)} сообщений")
-        
-        # Обновляем счётчик в стриме
-        stream = TwitchStream.query.get(stream_id)
-        stream.chat_message_count = len(messages)
-        stream.chat_is_synthetic = True
-        db.session.commit()
     
     def archive_stream(self, vod_id, vod_title, vod_info):
         """Полный процесс: скачивание + сохранение чата"""
@@ -248,6 +406,9 @@ class TwitchArchiver:
         print(f"📺 Архивирование: {vod_title}")
         print(f"{'='*60}")
         
+        # Освобождаем место под новое видео (размер оцениваем заранее)
+        self.retention.enforce(reserve_bytes=self.retention.estimate_size(vod_info))
+        
         # Скачиваем видео
         video_path = self.download_vod(vod_id, vod_title)
         if not video_path:
@@ -283,24 +444,33 @@ class TwitchArchiver:
             return 0
         
         archived_count = 0
+        self.progress.start_sync(self.channel_name, len(vods))
         
-        for i, vod in enumerate(vods, 1):
-            print(f"\n[{i}/{len(vods)}]", end=" ")
-            
-            # Проверяем, не архивирован ли уже
-            existing = TwitchStream.query.filter_by(twitch_video_id=vod['id']).first()
-            if existing:
-                print(f"⏭️  Уже архивирован")
-                continue
+        try:
+            for i, vod in enumerate(vods, 1):
+                print(f"\n[{i}/{len(vods)}]", end=" ")
+                
+                # Проверяем, не архивирован ли уже
+                existing = TwitchStream.query.filter_by(twitch_video_id=vod['id']).first()
+                if existing:
+                    print(f"⏭️  Уже архивирован")
+                    self.progress.vod_done()
+                    continue
+                
+                try:
+                    self.archive_stream(vod['id'], vod['title'], vod)
+                    archived_count += 1
+                    time.sleep(2)  # Задержка между скачиваниями
+                except Exception as e:
+                    logger.error(f"❌ Ошибка при архивировании {vod['id']}: {e}")
+                    print(f"❌ Ошибка: {e}")
+                finally:
+                    self.progress.vod_done()
             
-            try:
-                self.archive_stream(vod['id'], vod['title'], vod)
-                archived_count += 1
-                time.sleep(2)  # Задержка между скачиваниями
-            except Exception as e:
-                logger.error(f"❌ Ошибка при архивировании {vod['id']}: {e}")
-                print(f"❌ Ошибка: {e}")
-                continue
+            if archived_count:
+                self.retention.enforce()
+        finally:
+            self.progress.finish_sync(archived_count)
         
         logger.info(f"✅ Синхронизация завершена! Архивировано {archived_count} новых VOD")
         print(f"\n{'='*60}")